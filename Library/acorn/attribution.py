@@ -0,0 +1,152 @@
+"""
+Per-rule P&L and risk attribution.
+
+The exposure of an instrument is the weighted sum of its rule forecasts scaled by its average exposure, so the P&L
+of each day splits exactly into a part per rule: weight × forecast / 10 × average exposure × next day's return.
+Everything is computed over instrument × time × rule arrays in one vectorised pass, and aggregated by rule, rule
+family (e.g. momentum, breakout, accel) and instrument.
+"""
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from acorn.reporting import Metrics
+
+
+def rule_family(rule: str) -> str:
+    return re.sub(r'\d+$', '', rule)
+
+
+def forward_fill(values: np.ndarray, axis: int = 1) -> np.ndarray:
+    # carry the last non-nan value forward along axis, leaving leading nans as they are
+    values = np.moveaxis(values, axis, -1)
+    idx = np.where(np.isnan(values), 0, np.arange(values.shape[-1]))
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    filled = np.take_along_axis(values, idx, axis=-1)
+    return np.moveaxis(filled, -1, axis)
+
+
+def rolling_sum(values: np.ndarray, window: int, axis: int = 0) -> np.ndarray:
+    cumsum = np.cumsum(values, axis=axis)
+    lead = np.take(cumsum, np.arange(window - 1, values.shape[axis]), axis=axis)
+    lag = np.take(cumsum, np.arange(0, values.shape[axis] - window), axis=axis)
+    zeros = np.zeros_like(np.take(cumsum, [0], axis=axis))
+    return lead - np.concatenate([zeros, lag], axis=axis)
+
+
+class RuleAttribution:
+    def __init__(self, forecasts: np.ndarray, weights: np.ndarray, returns: np.ndarray,
+                 instruments: List[str], rules: List[str], times: Optional[np.ndarray] = None,
+                 average_exposure: Optional[np.ndarray] = None):
+        """
+        :param forecasts: capped rule forecasts, instrument × time × rule
+        :param weights: rule weights, rule or instrument × rule
+        :param returns: instrument returns over each period, instrument × time
+        :param average_exposure: exposure for a forecast of 10 as a fraction of capital, instrument × time.
+                                 Defaults to 1, giving P&L in units of average exposure.
+        """
+        self.instruments = list(instruments)
+        self.rules = list(rules)
+        self.families = sorted(set(rule_family(r) for r in self.rules))
+        self.times = times
+
+        weights = np.asarray(weights, dtype=float)
+        weights = weights[None, None, :] if weights.ndim == 1 else weights[:, None, :]
+        exposure = np.nan_to_num(forecasts) * weights / 10
+        if average_exposure is not None:
+            exposure = exposure * np.nan_to_num(average_exposure)[:, :, None]
+
+        # exposure held at the end of period t earns the return over period t + 1
+        self.pnl = np.zeros_like(exposure)
+        self.pnl[:, 1:, :] = exposure[:, :-1, :] * np.nan_to_num(returns)[:, 1:, None]
+
+        # one-hot rule -> family map, so family aggregates are a matrix product
+        self.family_map = np.array([[rule_family(r) == f for f in self.families] for r in self.rules], dtype=float)
+
+    def series(self, by: str = 'rule') -> np.ndarray:
+        """P&L per period, time × rule, time × family or time × instrument."""
+        if by == 'rule':
+            return self.pnl.sum(axis=0)
+        elif by == 'family':
+            return self.pnl.sum(axis=0) @ self.family_map
+        elif by == 'instrument':
+            return self.pnl.sum(axis=2).T
+        raise ValueError(f"unknown attribution {by}")
+
+    def labels(self, by: str = 'rule') -> List[str]:
+        return {'rule': self.rules, 'family': self.families, 'instrument': self.instruments}[by]
+
+    def total(self) -> np.ndarray:
+        return self.pnl.sum(axis=(0, 2))
+
+    def pnl_by(self, by: str = 'rule') -> Dict[str, float]:
+        return dict(zip(self.labels(by), self.series(by).sum(axis=0)))
+
+    def instrument_rule_pnl(self) -> np.ndarray:
+        """Total P&L, instrument × rule."""
+        return self.pnl.sum(axis=1)
+
+    def risk_by(self, by: str = 'rule') -> Dict[str, float]:
+        # Euler decomposition: contribution = cov(part, total) / std(total), summing to the std of the total P&L
+        series = self.series(by)
+        total = series.sum(axis=1)
+        centered = series - series.mean(axis=0)
+        total_centered = total - total.mean()
+        n = max(len(total) - 1, 1)
+        std = np.sqrt(total_centered @ total_centered / n)
+        contributions = centered.T @ total_centered / n / std if std else np.zeros(series.shape[1])
+        return dict(zip(self.labels(by), contributions))
+
+    def rolling_pnl(self, window: int, by: str = 'rule') -> np.ndarray:
+        """P&L over each trailing window, (time - window + 1) × parts."""
+        return rolling_sum(self.series(by), window)
+
+    def rolling_risk(self, window: int, by: str = 'rule') -> np.ndarray:
+        """Euler risk contributions over each trailing window, (time - window + 1) × parts."""
+        series = self.series(by)
+        total = series.sum(axis=1)
+        n = window
+        sum_x = rolling_sum(series, window)
+        sum_t = rolling_sum(total, window)
+        sum_xt = rolling_sum(series * total[:, None], window)
+        sum_tt = rolling_sum(total * total, window)
+        cov = (sum_xt - sum_x * sum_t[:, None] / n) / (n - 1)
+        var = np.maximum((sum_tt - sum_t * sum_t / n) / (n - 1), 0)
+        std = np.sqrt(var)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(std[:, None] > 0, cov / std[:, None], 0.0)
+
+    @classmethod
+    def from_log(cls, forecasts: List[Metrics], metrics: List[Metrics], weights: Dict[str, float]):
+        """
+        Build the attribution from the ∞ forecast records and § metrics records of a backtest log, taking the
+        returns from the traced prices and the average exposure from the traced average_exposure and capital.
+        """
+        instruments = sorted({m.symbol for m in forecasts})
+        rules = list(weights)
+        times = np.array(sorted({m.datetime.date() for m in forecasts}), dtype='datetime64[D]')
+        s_index = {s: i for i, s in enumerate(instruments)}
+        t_index = {t: i for i, t in enumerate(times.tolist())}
+
+        cube = np.full((len(instruments), len(times), len(rules)), np.nan)
+        for m in forecasts:
+            cube[s_index[m.symbol], t_index[m.datetime.date()]] = [m.metrics.get(r, np.nan) for r in rules]
+
+        prices = np.full((len(instruments), len(times)), np.nan)
+        average_exposure = np.full((len(instruments), len(times)), np.nan)
+        for m in metrics:
+            t = t_index.get(m.datetime.date())
+            if m.symbol in s_index and t is not None:
+                prices[s_index[m.symbol], t] = m.metrics['price']
+                average_exposure[s_index[m.symbol], t] = m.metrics['average_exposure'] / m.metrics['capital']
+
+        # positions whose evaluation was skipped keep their last forecast, price and exposure
+        cube = forward_fill(cube, axis=1)
+        prices = forward_fill(prices, axis=1)
+        average_exposure = forward_fill(average_exposure, axis=1)
+
+        returns = np.zeros_like(prices)
+        returns[:, 1:] = prices[:, 1:] / prices[:, :-1] - 1
+
+        return cls(cube, np.array([weights[r] for r in rules]), returns, instruments, rules, times, average_exposure)
@@ -0,0 +1,95 @@
+"""
+Capital correction, see https://qoppac.blogspot.com/2016/06/capital-correction-pysystemtrade.html
+
+* fixed: trade the initial capital regardless of profits and losses
+* full compounding: trade the current account value
+* half compounding: losses reduce the capital traded but profits don't increase it, so the capital is the initial
+  capital less the current drawdown from the high-water mark of the account value
+
+The correction is applied to the account as a whole rather than tracked per instrument: Carver corrects the capital
+of the account, instrument profits and losses only matter through the account value, and one read of the portfolio
+value per day replaces a per-instrument walk of the holdings. Each instrument trades an equal share of the corrected
+capital.
+
+Schemes are named by plain strings so the offline functions work outside LEAN; the algorithm maps its
+CapitalCorrection setting onto them.
+"""
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+
+FIXED = 'fixed'
+FULL_COMPOUNDING = 'full_compounding'
+HALF_COMPOUNDING = 'half_compounding'
+SCHEMES = [FIXED, FULL_COMPOUNDING, HALF_COMPOUNDING]
+
+
+class CapitalEngine:
+    """
+    Trading capital for the whole portfolio, updated once per day and read by every position.
+    """
+
+    def __init__(self, initial_capital: float, instruments: int, scheme: str):
+        self.instruments = instruments
+        self.scheme = scheme
+        self.initial_capital = initial_capital
+        self.high_watermark = initial_capital
+        self.capital = initial_capital
+        self.instrument_capital = initial_capital / instruments
+        self.last_update: Optional[date] = None
+
+    def update(self, day: date, equity: float):
+        if day == self.last_update:
+            return
+        self.last_update = day
+
+        if equity > self.high_watermark:
+            self.high_watermark = equity
+
+        if self.scheme == FULL_COMPOUNDING:
+            capital = equity
+        elif self.scheme == HALF_COMPOUNDING:
+            capital = max(self.initial_capital - (self.high_watermark - equity), 0.0)
+        else:
+            capital = self.initial_capital
+
+        self.capital = capital
+        self.instrument_capital = capital / self.instruments
+
+
+def capital_from_equity(equity: np.ndarray, initial_capital: float, scheme: str) -> np.ndarray:
+    """The capital a scheme would trade given an account value series."""
+    equity = np.asarray(equity, dtype=float)
+    if scheme == FULL_COMPOUNDING:
+        return equity.copy()
+    elif scheme == HALF_COMPOUNDING:
+        high_watermark = np.maximum.accumulate(np.maximum(equity, initial_capital))
+        return np.maximum(initial_capital - (high_watermark - equity), 0.0)
+    else:
+        return np.full_like(equity, initial_capital)
+
+
+def simulate(returns: np.ndarray, initial_capital: float, scheme: str) -> np.ndarray:
+    """
+    The account value series from returns on the capital traded, e.g. the daily P&L of a fixed capital backtest
+    divided by its capital.
+    """
+    returns = np.asarray(returns, dtype=float)
+    if scheme == FULL_COMPOUNDING:
+        return initial_capital * np.cumprod(1 + returns)
+    elif scheme == HALF_COMPOUNDING:
+        equity = np.empty_like(returns)
+        account, high_watermark = initial_capital, initial_capital
+        for i, r in enumerate(returns):
+            capital = max(initial_capital - (high_watermark - account), 0.0)
+            account += r * capital
+            high_watermark = max(high_watermark, account)
+            equity[i] = account
+        return equity
+    else:
+        return initial_capital * (1 + np.cumsum(returns))
+
+
+def compare(returns: np.ndarray, initial_capital: float) -> Dict[str, np.ndarray]:
+    return {scheme: simulate(returns, initial_capital, scheme) for scheme in SCHEMES}
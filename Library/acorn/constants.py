@@ -4,3 +4,8 @@ CALENDAR_DAYS_IN_YEAR = 365.25
 BUSINESS_DAYS_IN_YEAR = 256
 # Assume 256 business days in a year. Assume no returns are iid. Therefore, we can divide by sqrt(256)=16.
 ROOT_BDAYS_INYEAR = math.sqrt(BUSINESS_DAYS_IN_YEAR)
+
+NOTIONAL_TRADING_CAPITAL = 25_000
+
+# forex pairs used to convert instrument currencies to the account currency
+FX_PAIRS = ['NZDUSD', 'EURUSD', 'AUDUSD', 'USDJPY', 'USDCHF', 'GBPUSD', 'USDHKD', 'USDSGD', 'USDCAD']
@@ -1,5 +1,5 @@
-from collections import namedtuple
-from typing import Dict, Tuple, List
+from array import array
+from typing import Tuple, List
 
 from QuantConnect.Data import Slice
 
@@ -9,30 +9,40 @@ FORECAST_CAP = 20
 
 
 def capped_forecast(raw_forecast) -> float:
-    if raw_forecast > 0:
-        return min(FORECAST_CAP, raw_forecast)
-    elif raw_forecast < 0:
-        return max(-FORECAST_CAP, raw_forecast)
-    else:
+    if raw_forecast != raw_forecast:
+        # a rule which can't forecast (nan) has no opinion
         return 0.0
+    return max(-FORECAST_CAP, min(FORECAST_CAP, raw_forecast))
 
 
-Forecast = namedtuple('Forecast', 'name weight forecast')
-
 class Forecaster:
     def __init__(self, rules: List[Tuple[float, Rule]]):
         self.rules = rules
 
-    def forecast(self, data: Slice) -> (float, List[Forecast]):
-        forecasts = []
-        for weight, rule in self.rules:
-            rule_forecast = rule.forecast(data)
-
-            forecast = capped_forecast(rule_forecast)
-
-            forecasts.append(Forecast(rule.name, weight, forecast))
-
-        return sum([f.weight * f.forecast for f in forecasts]), forecasts
-
-    def ready(self):
-        return all([rule.ready() for _, rule in self.rules])
+        self._names = tuple(rule.name for _, rule in rules)
+        # the capped forecast of each rule from the latest call to forecast, reused between calls
+        self._forecasts = array('d', [0.0]) * len(rules)
+        self._plan = tuple((i, rule.signal, weight, rule.forecast_scalar) for i, (weight, rule) in enumerate(rules))
+        self._ready_checks = tuple(rule.ready for _, rule in rules)
+        self._ready = False
+
+    def forecast(self, data: Slice) -> float:
+        forecasts = self._forecasts
+        combined = 0.0
+        for i, signal, weight, scalar in self._plan:
+            forecast = capped_forecast(signal(data) * scalar)
+            forecasts[i] = forecast
+            combined += weight * forecast
+
+        return combined
+
+    def trace(self) -> str:
+        # the per-rule forecasts from the most recent call to forecast, formatted as "['momentum8: 1.23', ...]"
+        return '[' + ', '.join(f"'{name}: {round(forecast, 2)}'"
+                               for name, forecast in zip(self._names, self._forecasts)) + ']'
+
+    def ready(self) -> bool:
+        # indicators never become un-ready, so once all rules are ready the result is latched
+        if not self._ready:
+            self._ready = all(ready() for ready in self._ready_checks)
+        return self._ready
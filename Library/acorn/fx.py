@@ -0,0 +1,81 @@
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+
+class FxTable:
+    """
+    Portfolio-wide FX conversion rates, updated once per slice from the forex pairs the algorithm subscribes to.
+
+    The pairs form a currency graph which is compiled into a conversion path from every reachable currency to the
+    account currency, so indirect rates (e.g. HKD via USDHKD) and cross rates (e.g. EUR to JPY via USD) are
+    served from a single table of rates to the account currency.
+    """
+
+    def __init__(self, account_currency: str):
+        self.account_currency = account_currency
+        self.pairs: Dict[str, Tuple[str, str]] = {}
+        self.symbols = {}
+        self.prices: Dict[str, float] = {}
+        self.paths: Dict[str, Tuple[Tuple[str, bool], ...]] = {account_currency: ()}
+        self.to_account: Dict[str, float] = {account_currency: 1.0}
+
+    def add_pair(self, ticker: str, symbol=None):
+        # forex tickers are BASEQUOTE, e.g. EURUSD is the price of one EUR in USD
+        self.pairs[ticker] = (ticker[:3], ticker[3:])
+        self.symbols[ticker] = symbol if symbol is not None else ticker
+
+    def compile(self):
+        # breadth first search from the account currency, so each currency converts through the fewest pairs
+        edges = {}
+        for ticker, (base, quote) in self.pairs.items():
+            edges.setdefault(base, []).append((ticker, True, quote))
+            edges.setdefault(quote, []).append((ticker, False, base))
+
+        self.paths = {self.account_currency: ()}
+        queue = deque([self.account_currency])
+        while queue:
+            currency = queue.popleft()
+            for ticker, is_base, other in edges.get(currency, []):
+                if other not in self.paths:
+                    # converting other -> currency through ticker: other is the base if currency is the quote
+                    self.paths[other] = ((ticker, not is_base),) + self.paths[currency]
+                    queue.append(other)
+
+        self._update_rates()
+
+    def update(self, data):
+        changed = False
+        for ticker, symbol in self.symbols.items():
+            if data.ContainsKey(symbol):
+                self.prices[ticker] = data[symbol].Price
+                changed = True
+        if changed:
+            self._update_rates()
+
+    def set_price(self, ticker: str, price: float):
+        self.prices[ticker] = price
+        self._update_rates()
+
+    def _update_rates(self):
+        prices = self.prices
+        to_account = {}
+        for currency, path in self.paths.items():
+            rate = 1.0
+            for ticker, is_base in path:
+                price = prices.get(ticker)
+                if not price:
+                    break
+                rate = rate * price if is_base else rate / price
+            else:
+                to_account[currency] = rate
+        self.to_account = to_account
+
+    def ready(self, currency: str) -> bool:
+        return currency in self.to_account
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        # units of to_currency per unit of from_currency, None until the forex prices needed have been seen
+        to_account = self.to_account
+        if from_currency not in to_account or to_currency not in to_account:
+            return None
+        return to_account[from_currency] / to_account[to_currency]
@@ -0,0 +1,44 @@
+from collections import namedtuple
+from typing import Dict, List, Tuple
+
+from QuantConnect.Orders import OrderDirection
+from QuantConnect.Securities import Security, SecurityPortfolioManager
+
+# properties which don't change during a backtest, read once per security
+SecurityProperties = namedtuple('SecurityProperties', 'lot_size multiplier leverage')
+
+
+def security_properties(security: Security) -> SecurityProperties:
+    symbol_properties = security.SymbolProperties
+    return SecurityProperties(symbol_properties.LotSize, symbol_properties.ContractMultiplier, security.Leverage)
+
+
+class PortfolioSnapshot:
+    """
+    The portfolio state needed to rebalance, read once per rebalance event.
+
+    Reading the portfolio aggregates and each security's quantity and price are round-trips through pythonnet,
+    so they are taken once here and every position reads the plain python values. Buying power is only used for
+    tracing, so it is read lazily.
+    """
+
+    def __init__(self, portfolio: SecurityPortfolioManager, securities: List[Tuple[str, Security]]):
+        self.portfolio = portfolio
+        self.total_portfolio_value = portfolio.TotalPortfolioValue
+        self.margin_remaining = portfolio.MarginRemaining
+        self.total_margin_used = portfolio.TotalMarginUsed
+
+        self.quantity: Dict[str, float] = {}
+        self.price: Dict[str, float] = {}
+        for ticker, security in securities:
+            self.quantity[ticker] = security.Holdings.Quantity
+            self.price[ticker] = security.Price
+
+        self._buying_power: Dict[str, float] = {}
+        self._securities = dict(securities)
+
+    def buying_power(self, ticker: str) -> float:
+        if ticker not in self._buying_power:
+            symbol = self._securities[ticker].Symbol
+            self._buying_power[ticker] = self.portfolio.GetBuyingPower(symbol, OrderDirection.Buy)
+        return self._buying_power[ticker]
@@ -0,0 +1,172 @@
+"""
+A memory-mapped columnar store of the bid/ask bars in LEAN's zipped csv data.
+
+The LEAN data is parsed once into flat binary columns per ticker (timestamps, bid ohlc and ask ohlc), described by a
+json manifest. Newer data is appended incrementally, and loading returns zero-copy views of the memory-mapped
+columns, so research tools can read the whole universe without parsing any csv.
+
+> python -m acorn.pricestore data data/columnar --security-type cfd --resolution hour XAUUSD XAGUSD
+"""
+import argparse
+import json
+import os
+import zipfile
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PriceSeries = namedtuple('PriceSeries', 'time bid ask')
+
+MANIFEST = 'manifest.json'
+SECONDS_IN_DAY = 86_400
+
+COLUMNS = {
+    # name: (dtype, values per row)
+    'time': (np.int64, 1),
+    'bid': (np.float64, 4),
+    'ask': (np.float64, 4),
+}
+
+
+def parse_lean_zip(path: Path) -> Dict[str, np.ndarray]:
+    # LEAN quote bars: "yyyyMMdd HH:mm,bid o,h,l,c,[last bid size,]ask o,h,l,c[,last ask size]"
+    with zipfile.ZipFile(path) as z:
+        text = z.read(z.namelist()[0]).decode()
+
+    rows = [line.split(',') for line in text.splitlines() if line]
+    if not rows:
+        return {'time': np.empty(0, np.int64), 'bid': np.empty((0, 4)), 'ask': np.empty((0, 4))}
+
+    ask_start = 6 if len(rows[0]) >= 11 else 5
+    time = np.array([f'{r[0][:4]}-{r[0][4:6]}-{r[0][6:8]}T{r[0][9:]}' for r in rows], dtype='datetime64[s]')
+    bid = np.array([r[1:5] for r in rows], dtype=np.float64)
+    ask = np.array([r[ask_start:ask_start + 4] for r in rows], dtype=np.float64)
+    return {'time': time.astype(np.int64), 'bid': bid, 'ask': ask}
+
+
+def resample_daily(series: PriceSeries) -> PriceSeries:
+    if len(series.time) == 0:
+        return series
+    day = series.time.astype('datetime64[s]').astype(np.int64) // SECONDS_IN_DAY
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    ends = np.r_[starts[1:], len(day)] - 1
+
+    def ohlc(prices):
+        return np.column_stack([prices[starts, 0],
+                                np.maximum.reduceat(prices[:, 1], starts),
+                                np.minimum.reduceat(prices[:, 2], starts),
+                                prices[ends, 3]])
+
+    time = (day[starts] * SECONDS_IN_DAY).astype('datetime64[s]')
+    return PriceSeries(time, ohlc(series.bid), ohlc(series.ask))
+
+
+class PriceStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        manifest_path = self.root / MANIFEST
+        self.manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        self._maps = {}
+
+    @staticmethod
+    def key(ticker: str, security_type: str, resolution: str) -> str:
+        return f'{security_type}/{resolution}/{ticker.lower()}'
+
+    def _write_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / (MANIFEST + '.tmp')
+        tmp.write_text(json.dumps(self.manifest, indent=2, sort_keys=True))
+        os.replace(tmp, self.root / MANIFEST)
+
+    def update(self, data_folder, tickers: List[str], security_type: str = 'cfd', market: str = 'oanda',
+               resolution: str = 'hour') -> Dict[str, int]:
+        """Append the bars newer than those already stored, returning the number of rows added per ticker."""
+        added = {}
+        for ticker in tickers:
+            key = self.key(ticker, security_type, resolution)
+            source = Path(data_folder) / security_type / market / resolution / f'{ticker.lower()}.zip'
+            entry = self.manifest.get(key, {'rows': 0, 'first': None, 'last': None, 'source_mtime': None})
+
+            source_mtime = source.stat().st_mtime
+            if entry['source_mtime'] == source_mtime:
+                added[ticker] = 0
+                continue
+
+            columns = parse_lean_zip(source)
+            if entry['last'] is not None:
+                new = columns['time'] > entry['last']
+                columns = {name: values[new] for name, values in columns.items()}
+
+            n = len(columns['time'])
+            if n:
+                self._append(key, entry['rows'], columns)
+                entry['first'] = entry['first'] if entry['first'] is not None else int(columns['time'][0])
+                entry['last'] = int(columns['time'][-1])
+                entry['rows'] += n
+            entry['source_mtime'] = source_mtime
+            self.manifest[key] = entry
+            self._maps.pop(key, None)
+            added[ticker] = n
+
+        self._write_manifest()
+        return added
+
+    def _append(self, key: str, rows: int, columns: Dict[str, np.ndarray]):
+        directory = self.root / key
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, (dtype, width) in COLUMNS.items():
+            path = directory / name
+            with open(path, 'ab') as f:
+                # drop anything written after the manifest was last saved, e.g. by an interrupted update
+                f.truncate(rows * width * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+    def _columns(self, key: str) -> PriceSeries:
+        if key not in self._maps:
+            rows = self.manifest[key]['rows']
+            maps = {}
+            for name, (dtype, width) in COLUMNS.items():
+                shape = (rows,) if width == 1 else (rows, width)
+                maps[name] = (np.memmap(self.root / key / name, dtype=dtype, mode='r', shape=shape)
+                              if rows else np.empty(shape, dtype))
+            self._maps[key] = PriceSeries(maps['time'].view('datetime64[s]'), maps['bid'], maps['ask'])
+        return self._maps[key]
+
+    def tickers(self, security_type: str = 'cfd', resolution: str = 'hour') -> List[str]:
+        prefix = f'{security_type}/{resolution}/'
+        return sorted(key[len(prefix):].upper() for key in self.manifest if key.startswith(prefix))
+
+    def load(self, ticker: str, start=None, end=None, security_type: str = 'cfd',
+             resolution: str = 'hour') -> PriceSeries:
+        """Zero-copy views of the bars of ticker with start <= time < end."""
+        series = self._columns(self.key(ticker, security_type, resolution))
+        lo = 0 if start is None else np.searchsorted(series.time, np.datetime64(start, 's'))
+        hi = len(series.time) if end is None else np.searchsorted(series.time, np.datetime64(end, 's'))
+        return PriceSeries(series.time[lo:hi], series.bid[lo:hi], series.ask[lo:hi])
+
+    def load_many(self, tickers: Optional[List[str]] = None, start=None, end=None, security_type: str = 'cfd',
+                  resolution: str = 'hour') -> Dict[str, PriceSeries]:
+        tickers = tickers if tickers is not None else self.tickers(security_type, resolution)
+        return {t: self.load(t, start, end, security_type, resolution) for t in tickers}
+
+    def daily(self, tickers: Optional[List[str]] = None, start=None, end=None, security_type: str = 'cfd',
+              resolution: str = 'hour') -> Dict[str, PriceSeries]:
+        return {t: resample_daily(s) for t, s in self.load_many(tickers, start, end, security_type, resolution).items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or update a columnar price store from LEAN data')
+    parser.add_argument('data_folder')
+    parser.add_argument('store')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--security-type', default='cfd')
+    parser.add_argument('--market', default='oanda')
+    parser.add_argument('--resolution', default='hour')
+    args = parser.parse_args()
+
+    store = PriceStore(args.store)
+    for ticker, n in store.update(args.data_folder, args.tickers, args.security_type, args.market,
+                                  args.resolution).items():
+        print(f'{ticker}: {n} rows added')
@@ -0,0 +1,42 @@
+# keeps rounding in the deviation arithmetic from letting a bound sit exactly on the threshold
+TOLERANCE = 1e-9
+
+
+class DeviationBound:
+    """
+    How far a position can drift from its last full evaluation before a rebalance could be needed.
+
+    The exposure deviation is forecast / 10 - held, where held = quantity × multiplier × scale and
+    scale = price × fx × risk / (target risk × capital). With an unchanged quantity, moving from the recorded
+    forecast and scale changes the deviation by at most |Δforecast| / 10 + |held| × |scale / recorded scale - 1|,
+    so while that stays within the slack left below the threshold no trade can follow and the full sizing path
+    can be skipped.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.valid = False
+        self.forecast = 0.0
+        self.held = 0.0
+        self.scale = 0.0
+        self.quantity = 0.0
+        self.slack = 0.0
+
+        self.evaluated = 0
+        self.skipped = 0
+        self.missed = 0
+
+    def record(self, forecast: float, scale: float, quantity: float, multiplier: float, deviation: float):
+        self.forecast = forecast
+        self.scale = scale
+        self.quantity = quantity
+        self.held = quantity * multiplier * scale
+        self.slack = self.threshold - abs(deviation) - TOLERANCE
+        self.valid = self.slack > 0 and scale != 0
+
+    def invalidate(self):
+        self.valid = False
+
+    def within(self, forecast: float, scale: float, quantity: float) -> bool:
+        return (self.valid and quantity == self.quantity and
+                abs(forecast - self.forecast) / 10 + abs(self.held) * abs(scale / self.scale - 1) < self.slack)
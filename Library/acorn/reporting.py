@@ -1,6 +1,10 @@
+import ast
 import json
 import re
+from collections import namedtuple
+from datetime import datetime
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 scatter_marker_map = {
     'circle': 'circle',
@@ -23,3 +27,90 @@ def results_json(results_path: Path) -> dict:
     return json.load(open(results_file[0]))
 
 
+def equity_values(results: dict) -> List[Tuple[float, float]]:
+    try:
+        values = results['Charts']['Strategy Equity']['Series']['Equity']['Values']
+    except (KeyError, TypeError):
+        return []
+    # older versions of LEAN write {x, y} points, newer ones write [x, open, high, low, close] candles
+    return [(v['x'], v['y']) if isinstance(v, dict) else (v[0], v[-1]) for v in values]
+
+
+Metrics = namedtuple('Metrics', ['datetime', 'symbol', 'metrics'])
+
+SECTION_MARKER = '§'
+
+
+# §
+# 2022-08-24T08:55:17.0045143Z TRACE:: Debug: § 2004-03-17 00:00:00+00:00 WTICOUSD quantity: 109.0 price: 37.406
+# 2022-08-24T08:55:17.0052008Z TRACE:: Debug: § 2004-03-18 00:00:00+00:00 WTICOUSD quantity: 109.0 price: 38.465
+def parse_metrics_line(line: str) -> Optional[Metrics]:
+    if SECTION_MARKER not in line:
+        return None
+    _, line = line.split(SECTION_MARKER)
+    date_str, time_str, symbol, *m = line.split()
+    dt = datetime.fromisoformat(f'{date_str}T{time_str}')
+    metrics = dict(zip([m[i].replace(':', '') for i in range(0, len(m), 2)],
+                       [float(m[i]) for i in range(1, len(m), 2)]))
+    return Metrics(dt, symbol, metrics)
+
+
+def parse_section_symbol_log(logpath) -> List[Metrics]:
+    with open(logpath, "r") as f:
+        return [m for m in (parse_metrics_line(line) for line in f) if m is not None]
+
+
+FORECAST_MARKER = '∞'
+
+
+# ∞
+# 2022-08-24T08:55:17.0045143Z TRACE:: Debug: ∞ 2004-03-17 00:00:00+00:00 WTICOUSD ['momentum8: 1.23', ...]
+def parse_forecast_line(line: str) -> Optional[Metrics]:
+    if FORECAST_MARKER not in line:
+        return None
+    _, line = line.split(FORECAST_MARKER)
+    date_str, time_str, symbol, forecasts = line.split(maxsplit=3)
+    dt = datetime.fromisoformat(f'{date_str}T{time_str}')
+    forecasts = dict(f.split(': ') for f in ast.literal_eval(forecasts))
+    return Metrics(dt, symbol, {k: float(v) for k, v in forecasts.items()})
+
+
+def parse_forecast_log(logpath) -> List[Metrics]:
+    with open(logpath, "r") as f:
+        return [m for m in (parse_forecast_line(line) for line in f) if m is not None]
+
+
+class LogFollower:
+    """
+    Tails a backtest log while LEAN is writing it.
+
+    Each call to poll reads from the byte offset reached by the previous call and returns the § records in the
+    lines completed since then. A trailing partial line is held back until the rest of it has been written.
+    """
+
+    def __init__(self, logpath, offset: int = 0):
+        self.logpath = Path(logpath)
+        self.offset = offset
+        self._partial = b''
+
+    def poll(self) -> List[Metrics]:
+        try:
+            size = self.logpath.stat().st_size
+        except FileNotFoundError:
+            return []
+
+        if size < self.offset:
+            # the log has been truncated or replaced, start again from the top
+            self.offset = 0
+            self._partial = b''
+        if size == self.offset:
+            return []
+
+        with open(self.logpath, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        self.offset += len(chunk)
+
+        *lines, self._partial = (self._partial + chunk).split(b'\n')
+        marker = SECTION_MARKER.encode()
+        return [parse_metrics_line(line.decode()) for line in lines if marker in line]
@@ -68,10 +68,18 @@ class Rule(ABC):
     def ready(self) -> bool:
         pass
 
+    @property
+    def forecast_scalar(self) -> float:
+        return forecast_scalars[self.name]
+
     @abstractmethod
-    def forecast(self, data: Slice) -> float:
+    def signal(self, data: Slice) -> float:
+        # the unscaled forecast
         pass
 
+    def forecast(self, data: Slice) -> float:
+        return self.signal(data) * self.forecast_scalar
+
     @abstractmethod
     def plot(self) -> None:
         pass
@@ -92,7 +100,7 @@ class BreakoutRule(Rule):
     def ready(self) -> bool:
         return self.max.IsReady
 
-    def forecast(self, data: Slice) -> float:
+    def signal(self, data: Slice) -> float:
         avg = (self.max.Current.Value + self.min.Current.Value) / 2
 
         if not data.ContainsKey(self.symbol):
@@ -103,7 +111,7 @@ class BreakoutRule(Rule):
         price = data[self.symbol].Price
         signal = (price - avg) / (self.max.Current.Value - self.min.Current.Value)
 
-        return signal * forecast_scalars[self.name]
+        return signal
 
     def plot(self) -> None:
         pass
@@ -128,7 +136,7 @@ class EWMACRule(Rule):
     def ready(self) -> bool:
         return self.slow_ma.IsReady
 
-    def forecast(self, data: Slice) -> float:
+    def signal(self, data: Slice) -> float:
         # MACf,st = MAft – MAst
         mac = self.fast_ma.Current.Value - self.slow_ma.Current.Value
 
@@ -138,7 +146,7 @@ class EWMACRule(Rule):
         # Risk-adjusted MAC forecast = MAC ÷ instrument risk in price units
         risk_adj_mac = mac / risk_in_price_units
 
-        return risk_adj_mac * forecast_scalars[self.name]
+        return risk_adj_mac
 
     def plot(self) -> None:
         pass
@@ -166,7 +174,7 @@ class AccelRule(Rule):
     def ready(self) -> bool:
         return self.slow_ma_lag.IsReady
 
-    def forecast(self, data: Slice) -> float:
+    def signal(self, data: Slice) -> float:
         mac = self.fast_ma.Current.Value - self.slow_ma.Current.Value
         risk_in_price_units = self.risk_estimator.estimate() * data[self.symbol].Price
         risk_adj_mac = mac / risk_in_price_units
@@ -175,9 +183,7 @@ class AccelRule(Rule):
         # TODO: ideally we would use the historic risk and price
         risk_adj_mac_lag = mac_lag / risk_in_price_units
 
-        signal = risk_adj_mac - risk_adj_mac_lag
-
-        return signal * forecast_scalars[self.name]
+        return risk_adj_mac - risk_adj_mac_lag
 
     def plot(self) -> None:
         pass
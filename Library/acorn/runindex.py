@@ -0,0 +1,151 @@
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from acorn.reporting import results_json, equity_values
+
+EQUITY_POINTS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    path TEXT NOT NULL,
+    created REAL NOT NULL,
+    equity TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS statistics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS parameters_name_value ON parameters(name, value);
+CREATE INDEX IF NOT EXISTS statistics_name_value ON statistics(name, value);
+"""
+
+
+def parse_statistic(text: str) -> Optional[float]:
+    # LEAN statistics are strings such as "0.52", "12.345%" or "$-1,234.56"
+    try:
+        return float(re.sub(r'[$%,\s]', '', text))
+    except ValueError:
+        return None
+
+
+def downsample(values: list, n: int = EQUITY_POINTS) -> list:
+    if len(values) <= n:
+        return values
+    step = (len(values) - 1) / (n - 1)
+    return [values[round(i * step)] for i in range(n)]
+
+
+def project_parameters(project) -> Dict[str, str]:
+    config_file = Path(project) / 'config.json'
+    if not config_file.exists():
+        return {}
+    config = json.loads(config_file.read_text())
+    return {k: str(v) for k, v in (config.get('parameters') or {}).items()}
+
+
+def run_parameters(results: dict, fallback: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    # LEAN records the GetParameter values of the run in its results. Runs without them fall back to the
+    # parameters in the project's config.json at the time of the scan
+    parameters = (results.get('AlgorithmConfiguration') or {}).get('Parameters')
+    if not parameters:
+        return dict(fallback or {})
+    return {k: str(v) for k, v in parameters.items()}
+
+
+class RunIndex:
+    """
+    A SQLite index of the backtests of a project.
+
+    Each run's parameters, headline statistics and a downsampled equity curve are recorded once, so runs can be
+    queried, ranked and overlaid without loading their full result json again.
+    """
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(str(db_path))
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scan(self, project) -> List[str]:
+        indexed = {name for name, in self.db.execute("SELECT name FROM runs")}
+        fallback_parameters = project_parameters(project)
+        added = []
+        for results_path in sorted((Path(project) / 'backtests').glob('*-*-*_*-*-*')):
+            if results_path.name in indexed:
+                continue
+            try:
+                results = results_json(results_path)
+            except (AssertionError, ValueError):
+                # still running, or failed without writing results
+                continue
+            self.add(results_path, results, fallback_parameters)
+            added.append(results_path.name)
+        self.db.commit()
+        return added
+
+    def add(self, results_path: Path, results: dict, fallback_parameters: Optional[Dict[str, str]] = None):
+        equity = downsample(equity_values(results))
+        cursor = self.db.execute("INSERT INTO runs (name, path, created, equity) VALUES (?, ?, ?, ?)",
+                                 (results_path.name, str(results_path), results_path.stat().st_ctime,
+                                  json.dumps(equity)))
+        run_id = cursor.lastrowid
+        self.db.executemany("INSERT INTO parameters VALUES (?, ?, ?)",
+                            [(run_id, k, v) for k, v in run_parameters(results, fallback_parameters).items()])
+        statistics = results.get('Statistics') or {}
+        self.db.executemany("INSERT INTO statistics VALUES (?, ?, ?, ?)",
+                            [(run_id, k, parse_statistic(v), v) for k, v in statistics.items()])
+
+    def _parameter_filter(self, parameters: Dict[str, str]) -> Tuple[str, list]:
+        clauses = ["runs.id IN (SELECT run_id FROM parameters WHERE name = ? AND value = ?)"] * len(parameters)
+        args = [x for k, v in parameters.items() for x in (k, str(v))]
+        return " AND ".join(clauses) or "1", args
+
+    def runs(self, **parameters) -> List[str]:
+        where, args = self._parameter_filter(parameters)
+        return [name for name, in self.db.execute(f"SELECT name FROM runs WHERE {where} ORDER BY created", args)]
+
+    def parameters(self, name: str) -> Dict[str, str]:
+        return dict(self.db.execute("SELECT parameters.name, value FROM parameters JOIN runs ON runs.id = run_id "
+                                    "WHERE runs.name = ?", (name,)))
+
+    def statistics(self, name: str) -> Dict[str, float]:
+        return dict(self.db.execute("SELECT statistics.name, value FROM statistics JOIN runs ON runs.id = run_id "
+                                    "WHERE runs.name = ?", (name,)))
+
+    def rank(self, statistic: str, n: Optional[int] = None, descending: bool = True,
+             **parameters) -> List[Tuple[str, float]]:
+        where, args = self._parameter_filter(parameters)
+        order = "DESC" if descending else "ASC"
+        query = (f"SELECT runs.name, value FROM statistics JOIN runs ON runs.id = run_id "
+                 f"WHERE statistics.name = ? AND value IS NOT NULL AND {where} ORDER BY value {order}")
+        if n is not None:
+            query += f" LIMIT {int(n)}"
+        return list(self.db.execute(query, [statistic] + args))
+
+    def equity_curves(self, names: List[str]) -> Dict[str, List[Tuple[float, float]]]:
+        rows = self.db.execute(f"SELECT name, equity FROM runs WHERE name IN ({','.join('?' * len(names))})", names)
+        return {name: [tuple(v) for v in json.loads(equity)] for name, equity in rows}
+
+    def overlay(self, names: List[str]) -> Dict[str, List[Tuple[float, float]]]:
+        # equity curves rebased to 1.0 at the start of each run so runs with different capital can be compared
+        return {name: [(x, y / values[0][1]) for x, y in values]
+                for name, values in self.equity_curves(names).items() if values and values[0][1]}
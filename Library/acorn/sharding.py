@@ -0,0 +1,196 @@
+"""
+Sharded backtests: one LEAN backtest per instrument (or group of instruments), run in parallel and merged into a
+single portfolio level report.
+
+Each shard trades its share of the capital with the IDM of the full universe, which StarterSystem reads from the
+"instrument", "capital" and "universe-size" parameters. As in run_many.sh the parameters are set in the project's
+config.json, and each shard gets its own copy of the project so that shards can run in parallel.
+
+A shard is only re-run when its parameters, its instruments' data, the forex data or the algorithm source have changed
+since its last run.
+"""
+import bisect
+import hashlib
+import json
+import math
+import shutil
+import subprocess
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from acorn.constants import CALENDAR_DAYS_IN_YEAR, FX_PAIRS
+from acorn.reporting import results_json, equity_values
+
+SHARDS_MANIFEST = 'shards.json'
+SHARD_PROJECTS = 'projects'
+MERGED_RESULTS = 'merged.json'
+SECONDS_IN_YEAR = CALENDAR_DAYS_IN_YEAR * 86_400
+
+
+@dataclass
+class Shard:
+    name: str
+    instruments: List[str]
+    capital: float
+    universe_size: int
+
+    def parameters(self) -> Dict[str, str]:
+        return {
+            'instrument': ','.join(self.instruments),
+            'capital': str(self.capital),
+            'universe-size': str(self.universe_size),
+        }
+
+
+def plan_shards(instruments: List[str], capital: float, group_size: int = 1) -> List[Shard]:
+    instruments = sorted(instruments)
+    groups = [instruments[i:i + group_size] for i in range(0, len(instruments), group_size)]
+    return [Shard('_'.join(group), group, round(capital * len(group) / len(instruments), 2), len(instruments))
+            for group in groups]
+
+
+def shard_project(project: Path, shard: Shard, root: Path) -> Path:
+    """A copy of the project with the shard's parameters in its config.json."""
+    path = root / shard.name
+    path.mkdir(parents=True, exist_ok=True)
+    for source in project.glob('*.py'):
+        shutil.copy2(source, path / source.name)
+
+    config = json.loads((project / 'config.json').read_text())
+    # the copies aren't the cloud project, don't let them claim its ids
+    config.pop('cloud-id', None)
+    config.pop('local-id', None)
+    config['parameters'] = dict(config.get('parameters') or {}, **shard.parameters())
+    (path / 'config.json').write_text(json.dumps(config, indent=4))
+    return path
+
+
+def lean_backtest(project: Path, shard: Shard, output: Path) -> None:
+    project = shard_project(project, shard, output.parent / SHARD_PROJECTS)
+    subprocess.run(['lean', 'backtest', str(project), '--output', str(output)], check=True)
+
+
+def fingerprint(project: Path, shard: Shard, data_folder: Path, fx_pairs: List[str] = FX_PAIRS) -> str:
+    h = hashlib.sha1(json.dumps(shard.parameters(), sort_keys=True).encode())
+    sources = [project / 'main.py'] + sorted((project.parent / 'Library' / 'acorn').glob('*.py'))
+    for path in sources:
+        h.update(path.read_bytes())
+    # every shard converts through the forex pairs, so their data is an input of every shard
+    patterns = [f'cfd/*/*/{ticker.lower()}.zip' for ticker in shard.instruments]
+    patterns += [f'forex/*/*/{ticker.lower()}.zip' for ticker in fx_pairs]
+    for pattern in patterns:
+        for path in sorted(data_folder.glob(pattern)):
+            stat = path.stat()
+            h.update(f'{path}:{stat.st_size}:{stat.st_mtime}'.encode())
+    return h.hexdigest()
+
+
+class ShardedBacktest:
+    def __init__(self, project, shards: List[Shard], output, data_folder='data',
+                 executor: Optional[Executor] = None,
+                 runner: Callable[[Path, Shard, Path], None] = lean_backtest):
+        self.project = Path(project)
+        self.shards = shards
+        self.output = Path(output)
+        self.data_folder = Path(data_folder)
+        # each shard is a separate lean process, so threads are enough to run them in parallel
+        self.executor = executor
+        self.runner = runner
+
+    def shard_path(self, shard: Shard) -> Path:
+        return self.output / shard.name
+
+    def run(self, force: bool = False) -> List[str]:
+        """Run the shards which have changed since their last successful run, returning their names."""
+        manifest_path = self.output / SHARDS_MANIFEST
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+        fingerprints = {s.name: fingerprint(self.project, s, self.data_folder) for s in self.shards}
+        stale = [s for s in self.shards if force or manifest.get(s.name) != fingerprints[s.name]]
+
+        executor = self.executor or ThreadPoolExecutor()
+        try:
+            futures = {s.name: executor.submit(self.runner, self.project, s, self.shard_path(s)) for s in stale}
+            for name, future in futures.items():
+                future.result()
+                manifest[name] = fingerprints[name]
+        finally:
+            self.output.mkdir(parents=True, exist_ok=True)
+            manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+            if self.executor is None:
+                executor.shutdown()
+
+        return [s.name for s in stale]
+
+    def merge(self) -> dict:
+        merged = merge_results({s.name: results_json(self.shard_path(s)) for s in self.shards})
+        with open(self.output / MERGED_RESULTS, 'w') as f:
+            json.dump(merged, f, indent=2)
+        return merged
+
+
+def merge_equity(curves: List[List[Tuple[float, float]]]) -> List[Tuple[float, float]]:
+    # sum the shards' equity, carrying each shard's last value forward (and its first value back) between samples
+    times = sorted({x for curve in curves for x, _ in curve})
+    total = [0.0] * len(times)
+    for curve in curves:
+        if not curve:
+            continue
+        xs = [x for x, _ in curve]
+        for i, t in enumerate(times):
+            j = bisect.bisect_right(xs, t) - 1
+            total[i] += curve[max(j, 0)][1]
+    return list(zip(times, total))
+
+
+def merge_orders(results: Dict[str, dict]) -> Dict[str, dict]:
+    orders = [dict(order, Shard=name) for name, r in results.items() for order in (r.get('Orders') or {}).values()]
+    orders.sort(key=lambda o: o.get('Time', ''))
+    return {str(i): dict(order, Id=i) for i, order in enumerate(orders, 1)}
+
+
+def equity_statistics(equity: List[Tuple[float, float]]) -> Dict[str, str]:
+    if len(equity) < 2:
+        return {}
+    values = [y for _, y in equity]
+    start, end = values[0], values[-1]
+    years = (equity[-1][0] - equity[0][0]) / SECONDS_IN_YEAR
+
+    returns = [b / a - 1 for a, b in zip(values, values[1:]) if a]
+    periods_per_year = len(returns) / years if years else 0
+    mean = sum(returns) / len(returns)
+    std = math.sqrt(sum((r - mean) ** 2 for r in returns) / max(len(returns) - 1, 1))
+    annual_std = std * math.sqrt(periods_per_year)
+    sharpe = mean * periods_per_year / annual_std if annual_std else 0
+
+    high_watermark, drawdown = values[0], 0.0
+    for v in values:
+        high_watermark = max(high_watermark, v)
+        drawdown = max(drawdown, 1 - v / high_watermark)
+
+    return {
+        'Start Equity': f'{start:.2f}',
+        'End Equity': f'{end:.2f}',
+        'Net Profit': f'{100 * (end / start - 1):.3f}%',
+        'Compounding Annual Return': f'{100 * ((end / start) ** (1 / years) - 1):.3f}%' if years else '0%',
+        'Annual Standard Deviation': f'{annual_std:.3f}',
+        'Sharpe Ratio': f'{sharpe:.3f}',
+        'Drawdown': f'{100 * drawdown:.1f}%',
+    }
+
+
+def merge_results(results: Dict[str, dict]) -> dict:
+    equity = merge_equity([equity_values(r) for r in results.values()])
+    orders = merge_orders(results)
+    statistics = equity_statistics(equity)
+    statistics['Total Trades'] = str(len(orders))
+    return {
+        'Statistics': statistics,
+        'Charts': {'Strategy Equity': {'Series': {'Equity': {'Values': [{'x': x, 'y': y} for x, y in equity]}}}},
+        'Orders': orders,
+        'ShardStatistics': {name: r.get('Statistics') or {} for name, r in results.items()},
+        'Merged': datetime.now(timezone.utc).isoformat(),
+    }
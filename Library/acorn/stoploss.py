@@ -0,0 +1,70 @@
+from typing import Dict, List
+
+# Leveraged Trading, Starter System: stop loss gap = instrument risk in price units × stop loss fraction
+STOP_LOSS_FRACTION = 0.5
+
+
+class TrailingStopWatch:
+    """
+    Trailing stops for the open positions.
+
+    Only open positions are watched. Prices are held signed by the direction of the position, so long and short
+    stops share one code path: the watermark is the best signed price seen since the position was opened and the
+    trigger level is the watermark less the stop loss gap. Each update is one comparison per watched symbol.
+
+    Stops are evaluated intrabar: a long is stopped when the bar's low reaches the trigger and its watermark follows
+    the bar's high, a short the reverse. As the order of the high and low within a bar is unknown, the bar is first
+    checked against the trigger level from before it, and only then moves the watermark.
+    """
+
+    def __init__(self):
+        # symbol -> [direction, signed watermark, gap, signed trigger level]
+        self.watched: Dict[object, list] = {}
+
+    def watch(self, symbol, direction: int, price: float, gap: float):
+        entry = self.watched.get(symbol)
+        if entry is None or entry[0] != direction:
+            watermark = direction * price
+        else:
+            watermark = max(entry[1], direction * price)
+        self.watched[symbol] = [direction, watermark, gap, watermark - gap]
+
+    def unwatch(self, symbol):
+        self.watched.pop(symbol, None)
+
+    def set_gap(self, symbol, gap: float):
+        entry = self.watched.get(symbol)
+        if entry is not None:
+            entry[2] = gap
+            entry[3] = entry[1] - gap
+
+    def watermark(self, symbol) -> float:
+        direction, watermark, _, _ = self.watched[symbol]
+        return direction * watermark
+
+    def trigger_level(self, symbol) -> float:
+        direction, _, _, trigger = self.watched[symbol]
+        return direction * trigger
+
+    def update(self, symbol, high: float, low: float) -> bool:
+        entry = self.watched[symbol]
+        if entry[0] > 0:
+            best, worst = high, low
+        else:
+            best, worst = -low, -high
+        if worst <= entry[3]:
+            return True
+        if best > entry[1]:
+            entry[1] = best
+            entry[3] = best - entry[2]
+        return False
+
+    def check(self, data) -> List:
+        # the watched symbols in the slice whose stop has been hit
+        triggered = []
+        for symbol in self.watched:
+            if data.ContainsKey(symbol):
+                bar = data[symbol]
+                if self.update(symbol, bar.High, bar.Low):
+                    triggered.append(symbol)
+        return triggered
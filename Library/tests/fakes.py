@@ -0,0 +1,9 @@
+from collections import namedtuple
+
+# the parts of a LEAN bar and Slice used by the library
+Bar = namedtuple('Bar', 'Price High Low', defaults=(None, None, None))
+
+
+class FakeSlice(dict):
+    def ContainsKey(self, symbol):
+        return symbol in self
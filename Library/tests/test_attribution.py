@@ -0,0 +1,57 @@
+import numpy as np
+
+from acorn.attribution import RuleAttribution, forward_fill, rolling_sum, rule_family
+
+
+def test_rule_family():
+    assert rule_family('momentum16') == 'momentum'
+    assert rule_family('accel64') == 'accel'
+
+
+def test_forward_fill():
+    values = np.array([[np.nan, 1, np.nan, 3, np.nan]])
+    np.testing.assert_array_equal(forward_fill(values), [[np.nan, 1, 1, 3, 3]])
+
+
+def test_rolling_sum():
+    np.testing.assert_array_equal(rolling_sum(np.arange(5.0), 3), [3, 6, 9])
+
+
+def attribution():
+    rng = np.random.default_rng(1)
+    instruments, times, rules = 3, 250, ['momentum8', 'momentum16', 'breakout10', 'accel16']
+    forecasts = rng.uniform(-20, 20, (instruments, times, len(rules)))
+    returns = rng.normal(0, 0.01, (instruments, times))
+    weights = np.array([0.15, 0.15, 0.3, 0.4])
+    return RuleAttribution(forecasts, weights, returns, ['A', 'B', 'C'], rules), forecasts, weights, returns
+
+
+def test_pnl_attribution_sums_to_total():
+    a, forecasts, weights, returns = attribution()
+
+    exposure = (forecasts * weights).sum(axis=2) / 10
+    expected_total = (exposure[:, :-1] * returns[:, 1:]).sum(axis=0)
+    np.testing.assert_allclose(a.total()[1:], expected_total)
+
+    total = expected_total.sum()
+    for by in ['rule', 'family', 'instrument']:
+        assert np.isclose(sum(a.pnl_by(by).values()), total)
+    assert list(a.pnl_by('family')) == ['accel', 'breakout', 'momentum']
+    np.testing.assert_allclose(a.instrument_rule_pnl().sum(axis=1), list(a.pnl_by('instrument').values()))
+
+
+def test_risk_attribution_sums_to_std():
+    a, *_ = attribution()
+    std = a.total().std(ddof=1)
+    for by in ['rule', 'family', 'instrument']:
+        assert np.isclose(sum(a.risk_by(by).values()), std)
+
+
+def test_rolling():
+    a, *_ = attribution()
+    rolling_pnl = a.rolling_pnl(50, by='family')
+    assert rolling_pnl.shape == (201, 3)
+    np.testing.assert_allclose(rolling_pnl[-1], a.series('family')[-50:].sum(axis=0))
+
+    rolling_risk = a.rolling_risk(50)
+    np.testing.assert_allclose(rolling_risk[-1].sum(), a.total()[-50:].std(ddof=1))
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from acorn.capital import (CapitalEngine, FIXED, FULL_COMPOUNDING, HALF_COMPOUNDING, SCHEMES,
+                           capital_from_equity, compare, simulate)
+
+EQUITY = np.array([100.0, 110.0, 90.0, 95.0, 130.0, 120.0, 20.0])
+
+
+def test_half_compounding_capital():
+    capital = capital_from_equity(EQUITY, 100, HALF_COMPOUNDING)
+    # capital drops by the drawdown from the high-water mark, and never rises above the initial capital
+    np.testing.assert_array_equal(capital, [100, 100, 80, 85, 100, 90, 0])
+    assert (capital <= 100).all()
+
+
+def test_fixed_and_full_compounding_capital():
+    np.testing.assert_array_equal(capital_from_equity(EQUITY, 100, FIXED), np.full(len(EQUITY), 100))
+    np.testing.assert_array_equal(capital_from_equity(EQUITY, 100, FULL_COMPOUNDING), EQUITY)
+
+
+def test_engine_agrees_with_capital_from_equity():
+    for scheme in SCHEMES:
+        engine = CapitalEngine(100, 4, scheme)
+        capital = []
+        for i, equity in enumerate(EQUITY):
+            day = date(2020, 1, 1) + timedelta(days=i)
+            engine.update(day, equity)
+            # only the first update of a day counts
+            engine.update(day, 1_000)
+            capital.append(engine.capital)
+            assert engine.instrument_capital == engine.capital / 4
+        np.testing.assert_array_equal(capital, capital_from_equity(EQUITY, 100, scheme))
+
+
+def test_simulate():
+    returns = np.array([0.1, -0.2, 0.05, 0.3])
+    np.testing.assert_allclose(simulate(returns, 100, FIXED), [110, 90, 95, 125])
+    np.testing.assert_allclose(simulate(returns, 100, FULL_COMPOUNDING), [110, 88, 92.4, 120.12])
+    # after the loss only 80 of capital is traded
+    np.testing.assert_allclose(simulate(returns, 100, HALF_COMPOUNDING), [110, 90, 94, 119.2])
+    assert list(compare(returns, 100)) == SCHEMES
@@ -0,0 +1,39 @@
+import pytest
+
+from acorn.fx import FxTable
+from tests.fakes import Bar, FakeSlice
+
+
+def test_fx_table():
+    fx = FxTable('USD')
+    for ticker in ['EURUSD', 'USDHKD', 'USDJPY']:
+        fx.add_pair(ticker)
+    fx.compile()
+
+    assert fx.rate('USD', 'USD') == 1.0
+    assert fx.rate('EUR', 'USD') is None
+    assert not fx.ready('EUR')
+
+    fx.update(FakeSlice(EURUSD=Bar(1.1), USDHKD=Bar(7.8)))
+    assert fx.rate('EUR', 'USD') == pytest.approx(1.1)
+    assert fx.rate('USD', 'EUR') == pytest.approx(1 / 1.1)
+    assert fx.rate('HKD', 'USD') == pytest.approx(1 / 7.8)
+    assert fx.rate('EUR', 'JPY') is None
+
+    # only the pairs present in the slice are updated
+    fx.update(FakeSlice(USDJPY=Bar(130.0)))
+    assert fx.rate('EUR', 'USD') == pytest.approx(1.1)
+    assert fx.rate('EUR', 'JPY') == pytest.approx(1.1 * 130.0)
+    assert fx.rate('GBP', 'USD') is None
+
+
+def test_fx_table_indirect_path():
+    fx = FxTable('GBP')
+    fx.add_pair('GBPUSD')
+    fx.add_pair('USDHKD')
+    fx.compile()
+    assert fx.paths['HKD'] == (('USDHKD', False), ('GBPUSD', False))
+
+    fx.set_price('GBPUSD', 1.25)
+    fx.set_price('USDHKD', 7.8)
+    assert fx.rate('HKD', 'GBP') == pytest.approx(1 / 7.8 / 1.25)
@@ -0,0 +1,50 @@
+import os
+import zipfile
+
+import numpy as np
+
+from acorn.pricestore import PriceStore
+
+
+def write_zip(data_folder, ticker, lines):
+    path = data_folder / 'cfd' / 'oanda' / 'hour'
+    path.mkdir(parents=True, exist_ok=True)
+    zip_path = path / f'{ticker.lower()}.zip'
+    with zipfile.ZipFile(zip_path, 'w') as z:
+        z.writestr(f'{ticker.lower()}.csv', '\n'.join(lines))
+    return zip_path
+
+
+LINES = [
+    '20200101 22:00,10,12,9,11,0,10.1,12.1,9.1,11.1,0',
+    '20200101 23:00,11,13,10,12,0,11.1,13.1,10.1,12.1,0',
+    '20200102 00:00,12,15,11,14,0,12.1,15.1,11.1,14.1,0',
+]
+
+
+def test_price_store(tmp_path):
+    data = tmp_path / 'data'
+    zip_path = write_zip(data, 'XAUUSD', LINES[:2])
+
+    store = PriceStore(tmp_path / 'store')
+    assert store.update(data, ['XAUUSD']) == {'XAUUSD': 2}
+    assert store.update(data, ['XAUUSD']) == {'XAUUSD': 0}
+
+    write_zip(data, 'XAUUSD', LINES)
+    os.utime(zip_path, (1, 1))
+    assert store.update(data, ['XAUUSD']) == {'XAUUSD': 1}
+
+    # a fresh store reads the manifest written by the update
+    store = PriceStore(tmp_path / 'store')
+    assert store.tickers() == ['XAUUSD']
+    series = store.load('XAUUSD')
+    assert series.time[0] == np.datetime64('2020-01-01T22:00')
+    np.testing.assert_array_equal(series.bid[:, 3], [11, 12, 14])
+    np.testing.assert_array_equal(series.ask[2], [12.1, 15.1, 11.1, 14.1])
+
+    series = store.load('XAUUSD', start='2020-01-01T23:00', end='2020-01-02')
+    np.testing.assert_array_equal(series.bid[:, 0], [11])
+
+    daily = store.daily(['XAUUSD'])['XAUUSD']
+    np.testing.assert_array_equal(daily.time, np.array(['2020-01-01', '2020-01-02'], dtype='datetime64[s]'))
+    np.testing.assert_array_equal(daily.bid, [[10, 13, 9, 12], [12, 15, 11, 14]])
@@ -0,0 +1,36 @@
+from acorn.rebalance import DeviationBound
+
+
+def deviation(forecast, quantity, multiplier, scale):
+    return forecast / 10 - quantity * multiplier * scale
+
+
+def test_deviation_bound():
+    bound = DeviationBound(0.2)
+    assert not bound.within(10, 0.01, 100)
+
+    bound.record(10, 0.01, 100, 1, deviation(10, 100, 1, 0.01))
+    assert abs(bound.slack - 0.2) < 1e-6
+    assert bound.within(10.5, 0.0101, 100)
+    assert not bound.within(13, 0.01, 100)
+    assert not bound.within(10, 0.0125, 100)
+    # any change in quantity, e.g. from a fill, needs a full evaluation
+    assert not bound.within(10, 0.01, 101)
+
+    bound.invalidate()
+    assert not bound.within(10, 0.01, 100)
+
+
+def test_within_bound_never_crosses_threshold():
+    bound = DeviationBound(0.2)
+    bound.record(8, 0.01, 90, 1, deviation(8, 90, 1, 0.01))
+    for forecast in [6, 7, 8, 9, 10]:
+        for scale in [0.008, 0.0095, 0.01, 0.0105, 0.012]:
+            if bound.within(forecast, scale, 90):
+                assert abs(deviation(forecast, 90, 1, scale)) <= 0.2
+
+
+def test_no_bound_when_outside_threshold():
+    bound = DeviationBound(0.2)
+    bound.record(10, 0.01, 50, 1, deviation(10, 50, 1, 0.01))
+    assert not bound.valid
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+from acorn.reporting import LogFollower, parse_metrics_line, parse_forecast_line
+
+LINE = ("2022-08-24T08:55:17.0045143Z TRACE:: Debug: § 2004-03-17 00:00:00+00:00 WTICOUSD "
+        "position: 109.0 price: 37.406\n")
+
+
+def test_parse_metrics_line():
+    m = parse_metrics_line(LINE)
+    assert m.datetime == datetime(2004, 3, 17, tzinfo=timezone.utc)
+    assert m.symbol == 'WTICOUSD'
+    assert m.metrics == {'position': 109.0, 'price': 37.406}
+
+    assert parse_metrics_line("2022-08-24T08:55:17.0045143Z TRACE:: Debug: Added cfd WTICOUSD\n") is None
+
+
+def test_parse_forecast_line():
+    m = parse_forecast_line("2022-08-24T08:55:17.0052008Z TRACE:: Debug: ∞ 2004-03-17 00:00:00+00:00 WTICOUSD "
+                            "['momentum8: 1.23', 'breakout10: -20.0']\n")
+    assert m.symbol == 'WTICOUSD'
+    assert m.metrics == {'momentum8': 1.23, 'breakout10': -20.0}
+    assert parse_forecast_line(LINE) is None
+
+
+def test_log_follower(tmp_path):
+    log = tmp_path / "log.txt"
+    follower = LogFollower(log)
+    assert follower.poll() == []
+
+    with open(log, "w") as f:
+        f.write("2022-08-24T08:55:16.0000000Z TRACE:: Debug: Added cfd WTICOUSD\n")
+        f.write(LINE)
+        # partially written line is held back
+        f.write(LINE[:60])
+    results = follower.poll()
+    assert [m.metrics['price'] for m in results] == [37.406]
+
+    with open(log, "a") as f:
+        f.write(LINE[60:])
+        f.write(LINE.replace('37.406', '38.465'))
+    results = follower.poll()
+    assert [m.metrics['price'] for m in results] == [37.406, 38.465]
+    assert follower.poll() == []
+
+    # a new log replaces the old one
+    with open(log, "w") as f:
+        f.write(LINE)
+    assert len(follower.poll()) == 1
@@ -0,0 +1,53 @@
+import json
+
+from acorn.runindex import RunIndex, downsample, parse_statistic
+
+
+def write_run(project, name, instrument, sharpe, equity):
+    path = project / 'backtests' / name
+    path.mkdir(parents=True)
+    # the lean cli only writes the backtest id to config, the parameters are in the results
+    (path / 'config').write_text(json.dumps({'id': 1234}))
+    results = {
+        'AlgorithmConfiguration': {'Parameters': {'instrument': instrument} if instrument else {}},
+        'Statistics': {'Sharpe Ratio': str(sharpe), 'Drawdown': '12.5%', 'Total Fees': '$-1,234.50'},
+        'Charts': {'Strategy Equity': {'Series': {'Equity': {'Values': [{'x': i, 'y': y}
+                                                                       for i, y in enumerate(equity)]}}}},
+    }
+    (path / '1234.json').write_text(json.dumps(results))
+
+
+def test_parse_statistic():
+    assert parse_statistic('12.5%') == 12.5
+    assert parse_statistic('$-1,234.50') == -1234.5
+    assert parse_statistic('n/a') is None
+
+
+def test_downsample():
+    assert downsample(list(range(3)), 5) == [0, 1, 2]
+    assert downsample(list(range(101)), 5) == [0, 25, 50, 75, 100]
+
+
+def test_run_index(tmp_path):
+    project = tmp_path / 'starter_system'
+    write_run(project, '2022-08-01_10-00-00', 'XAUUSD', 0.4, [100, 110])
+    write_run(project, '2022-08-02_10-00-00', 'XAGUSD', 0.6, [100, 90])
+    # a run still in progress has no results yet
+    (project / 'backtests' / '2022-08-03_10-00-00').mkdir()
+    # a run without parameters in its results takes them from the project config
+    write_run(project, '2022-07-01_10-00-00', None, 0.1, [100, 100])
+    (project / 'config.json').write_text(json.dumps({'parameters': {'instrument': '$INSTRUMENT'}}))
+
+    with RunIndex(tmp_path / 'runs.db') as index:
+        assert index.scan(project) == ['2022-07-01_10-00-00', '2022-08-01_10-00-00', '2022-08-02_10-00-00']
+        assert index.scan(project) == []
+
+        assert index.runs(instrument='XAUUSD') == ['2022-08-01_10-00-00']
+        assert index.parameters('2022-08-02_10-00-00') == {'instrument': 'XAGUSD'}
+        assert index.runs(instrument='$INSTRUMENT') == ['2022-07-01_10-00-00']
+        assert index.statistics('2022-08-01_10-00-00')['Total Fees'] == -1234.5
+        assert index.rank('Sharpe Ratio') == [('2022-08-02_10-00-00', 0.6), ('2022-08-01_10-00-00', 0.4),
+                                              ('2022-07-01_10-00-00', 0.1)]
+        assert index.rank('Sharpe Ratio', n=1, descending=False) == [('2022-07-01_10-00-00', 0.1)]
+        assert index.rank('Sharpe Ratio', instrument='XAUUSD') == [('2022-08-01_10-00-00', 0.4)]
+        assert index.overlay(['2022-08-02_10-00-00']) == {'2022-08-02_10-00-00': [(0, 1.0), (1, 0.9)]}
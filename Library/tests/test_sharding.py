@@ -0,0 +1,82 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from acorn.sharding import ShardedBacktest, plan_shards, merge_equity, merge_results, shard_project
+
+
+def test_plan_shards():
+    shards = plan_shards(['XAUUSD', 'BCOUSD', 'XAGUSD'], 30_000, group_size=2)
+    assert [s.instruments for s in shards] == [['BCOUSD', 'XAGUSD'], ['XAUUSD']]
+    assert [s.capital for s in shards] == [20_000, 10_000]
+    assert shards[0].parameters() == {'instrument': 'BCOUSD,XAGUSD', 'capital': '20000.0', 'universe-size': '3'}
+
+
+def test_merge_equity():
+    a = [(1, 100.0), (3, 110.0)]
+    b = [(2, 50.0), (3, 40.0)]
+    assert merge_equity([a, b]) == [(1, 150.0), (2, 150.0), (3, 150.0)]
+
+
+def test_merge_results():
+    def results(equity, orders):
+        return {
+            'Statistics': {'Sharpe Ratio': '0.1'},
+            'Charts': {'Strategy Equity': {'Series': {'Equity': {'Values': [{'x': x, 'y': y} for x, y in equity]}}}},
+            'Orders': {str(i): o for i, o in enumerate(orders, 1)},
+        }
+
+    merged = merge_results({
+        'XAUUSD': results([(0, 100.0), (86_400, 105.0)], [{'Id': 1, 'Time': '2003-01-02T00:00:00Z'}]),
+        'XAGUSD': results([(0, 100.0), (86_400, 95.0)], [{'Id': 1, 'Time': '2003-01-01T00:00:00Z'}]),
+    })
+    assert merged['Charts']['Strategy Equity']['Series']['Equity']['Values'] == [{'x': 0, 'y': 200.0},
+                                                                                 {'x': 86_400, 'y': 200.0}]
+    assert [(o['Id'], o['Shard']) for o in merged['Orders'].values()] == [(1, 'XAGUSD'), (2, 'XAUUSD')]
+    assert merged['Statistics']['Net Profit'] == '0.000%'
+    assert merged['Statistics']['Total Trades'] == '2'
+
+
+def test_only_changed_shards_are_run(tmp_path):
+    project = tmp_path / 'starter_system'
+    project.mkdir()
+    (project / 'main.py').write_text('# algorithm')
+    shards = plan_shards(['XAUUSD', 'XAGUSD'], 20_000)
+
+    ran = []
+    with ThreadPoolExecutor() as executor:
+        backtest = ShardedBacktest(project, shards, tmp_path / 'shards', tmp_path / 'data', executor=executor,
+                                   runner=lambda project, shard, output: ran.append(shard.name))
+        assert backtest.run() == ['XAGUSD', 'XAUUSD']
+        assert backtest.run() == []
+
+        data = tmp_path / 'data' / 'cfd' / 'oanda' / 'hour'
+        data.mkdir(parents=True)
+        (data / 'xauusd.zip').write_bytes(b'new data')
+        assert backtest.run() == ['XAUUSD']
+
+        # new forex data affects every shard
+        forex = tmp_path / 'data' / 'forex' / 'oanda' / 'daily'
+        forex.mkdir(parents=True)
+        (forex / 'eurusd.zip').write_bytes(b'new data')
+        assert backtest.run() == ['XAGUSD', 'XAUUSD']
+        assert backtest.run(force=True) == ['XAGUSD', 'XAUUSD']
+    assert sorted(ran) == ['XAGUSD', 'XAGUSD', 'XAGUSD', 'XAUUSD', 'XAUUSD', 'XAUUSD', 'XAUUSD']
+
+
+def test_shard_project_has_its_own_config(tmp_path):
+    project = tmp_path / 'starter_system'
+    project.mkdir()
+    (project / 'main.py').write_text('# algorithm')
+    (project / 'config.json').write_text(json.dumps({
+        'algorithm-language': 'Python', 'parameters': {'instrument': '$INSTRUMENT'}, 'cloud-id': 1, 'local-id': 2}))
+
+    shards = plan_shards(['XAUUSD', 'SPX500USD'], 50_000)
+    paths = [shard_project(project, shard, tmp_path / 'projects') for shard in shards]
+
+    assert len(set(paths)) == 2
+    for shard, path in zip(shards, paths):
+        assert (path / 'main.py').read_text() == '# algorithm'
+        config = json.loads((path / 'config.json').read_text())
+        assert config['parameters'] == shard.parameters()
+        assert 'cloud-id' not in config and 'local-id' not in config
+    assert json.loads((project / 'config.json').read_text())['parameters'] == {'instrument': '$INSTRUMENT'}
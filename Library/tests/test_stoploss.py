@@ -0,0 +1,59 @@
+from acorn.stoploss import TrailingStopWatch
+from tests.fakes import Bar, FakeSlice
+
+
+def test_long_trailing_stop():
+    stops = TrailingStopWatch()
+    stops.watch('XAUUSD', 1, 100, 10)
+    assert stops.trigger_level('XAUUSD') == 90
+
+    assert not stops.update('XAUUSD', 98, 95)
+    assert not stops.update('XAUUSD', 120, 100)
+    assert stops.watermark('XAUUSD') == 120
+    assert stops.trigger_level('XAUUSD') == 110
+
+    stops.set_gap('XAUUSD', 5)
+    assert stops.trigger_level('XAUUSD') == 115
+    assert stops.update('XAUUSD', 118, 115)
+
+
+def test_short_trailing_stop():
+    stops = TrailingStopWatch()
+    stops.watch('XAGUSD', -1, 20, 2)
+    assert not stops.update('XAGUSD', 21, 20)
+    assert not stops.update('XAGUSD', 18, 15)
+    assert stops.watermark('XAGUSD') == 15
+    assert stops.trigger_level('XAGUSD') == 17
+    assert stops.update('XAGUSD', 17.5, 16)
+
+
+def test_intrabar_stop():
+    stops = TrailingStopWatch()
+    stops.watch('XAUUSD', 1, 100, 10)
+    # the low breaches the trigger even though the bar closes back above it
+    assert stops.update('XAUUSD', 101, 89)
+
+    # a bar's high doesn't move the trigger it is checked against
+    stops.watch('XAGUSD', 1, 100, 10)
+    assert not stops.update('XAGUSD', 120, 91)
+    assert stops.trigger_level('XAGUSD') == 110
+
+
+def test_rewatch_keeps_watermark_unless_direction_changes():
+    stops = TrailingStopWatch()
+    stops.watch('XAUUSD', 1, 100, 10)
+    stops.update('XAUUSD', 120, 115)
+    stops.watch('XAUUSD', 1, 110, 10)
+    assert stops.watermark('XAUUSD') == 120
+    stops.watch('XAUUSD', -1, 110, 10)
+    assert stops.watermark('XAUUSD') == 110
+
+
+def test_check():
+    stops = TrailingStopWatch()
+    stops.watch('XAUUSD', 1, 100, 10)
+    stops.watch('XAGUSD', -1, 20, 2)
+    assert stops.check(FakeSlice(XAUUSD=Bar(High=96, Low=95), XAGUSD=Bar(High=23, Low=21))) == ['XAGUSD']
+    assert stops.check(FakeSlice(XAUUSD=Bar(High=95, Low=89))) == ['XAUUSD']
+    stops.unwatch('XAUUSD')
+    assert stops.check(FakeSlice(XAUUSD=Bar(High=50, Low=50))) == []
@@ -0,0 +1,100 @@
+# Live dashboard for a running backtest, served by a local Bokeh server:
+#
+# > bokeh serve --show starter_system/live_chart.py
+#
+# The log of the latest backtest is tailed while LEAN writes it; only the § records appended since the last
+# poll are parsed, and they are streamed into rolling column data sources.
+from collections import defaultdict
+from itertools import cycle
+from pathlib import Path
+
+from bokeh.io import curdoc
+from bokeh.layouts import column
+from bokeh.models import ColumnDataSource, HoverTool
+from bokeh.palettes import Category20_20
+from bokeh.plotting import figure
+
+from acorn.reporting import latest_backtest_results_path, LogFollower
+
+POLL_INTERVAL_MS = 1000
+ROLLOVER = 20_000
+
+PORTFOLIO_METRICS = ['portfolio_value', 'margin_used']
+SYMBOL_METRICS = ['forecast', 'current_exposure', 'capped_exposure', 'position']
+
+
+def gen_figure(metric, x_range=None, height=150):
+    hover = HoverTool(tooltips=[('series', '$name'), ('date', '$x{%F}'), ('value', '$y')],
+                      formatters={'$x': 'datetime'})
+    if x_range:
+        p = figure(title=metric, x_range=x_range, x_axis_type="datetime", height=height)
+    else:
+        p = figure(title=metric, x_axis_type="datetime", height=height)
+    p.add_tools(hover)
+    return p
+
+
+class LiveChart:
+    def __init__(self, follower: LogFollower):
+        self.follower = follower
+        self.last_portfolio_datetime = None
+
+        self.portfolio_source = ColumnDataSource({k: [] for k in ['datetime'] + PORTFOLIO_METRICS})
+        self.symbol_sources = {}
+        self.colors = cycle(Category20_20)
+
+        pf = gen_figure(PORTFOLIO_METRICS[0])
+        self.figures = {PORTFOLIO_METRICS[0]: pf}
+        for metric in PORTFOLIO_METRICS[1:] + SYMBOL_METRICS:
+            self.figures[metric] = gen_figure(metric, pf.x_range)
+        for metric in PORTFOLIO_METRICS:
+            self.figures[metric].line(x='datetime', y=metric, source=self.portfolio_source, name=metric)
+
+        self.layout = column(*self.figures.values(), sizing_mode="scale_width")
+
+    def symbol_source(self, symbol) -> ColumnDataSource:
+        if symbol not in self.symbol_sources:
+            source = ColumnDataSource({k: [] for k in ['datetime'] + SYMBOL_METRICS})
+            color = next(self.colors)
+            for metric in SYMBOL_METRICS:
+                self.figures[metric].line(x='datetime', y=metric, source=source, name=symbol, color=color)
+            self.symbol_sources[symbol] = source
+        return self.symbol_sources[symbol]
+
+    def update(self):
+        results = self.follower.poll()
+        if not results:
+            return
+
+        portfolio = defaultdict(list)
+        symbols = defaultdict(lambda: defaultdict(list))
+        for m in results:
+            # portfolio level metrics are repeated on every symbol's record, keep one per timestamp
+            if m.datetime != self.last_portfolio_datetime:
+                self.last_portfolio_datetime = m.datetime
+                portfolio['datetime'].append(m.datetime)
+                for metric in PORTFOLIO_METRICS:
+                    portfolio[metric].append(m.metrics[metric])
+
+            symbol = symbols[m.symbol]
+            symbol['datetime'].append(m.datetime)
+            for metric in SYMBOL_METRICS:
+                symbol[metric].append(m.metrics[metric])
+
+        self.portfolio_source.stream(dict(portfolio), rollover=ROLLOVER)
+        for name, new_data in symbols.items():
+            self.symbol_source(name).stream(dict(new_data), rollover=ROLLOVER)
+
+
+project = "starter_system"
+base_dir = Path('/Users/markns/workspace/acorn-quantconnect')
+
+backtest_path = latest_backtest_results_path(base_dir / project)
+
+chart = LiveChart(LogFollower(backtest_path / "log.txt"))
+chart.update()
+
+doc = curdoc()
+doc.title = f"{project} {backtest_path.name}"
+doc.add_root(chart.layout)
+doc.add_periodic_callback(chart.update, POLL_INTERVAL_MS)
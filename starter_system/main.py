@@ -8,25 +8,39 @@ from QuantConnect.Algorithm import QCAlgorithm
 from QuantConnect.Data import Slice
 from QuantConnect.Securities.Cfd import Cfd
 
+from acorn.capital import CapitalEngine, FIXED, FULL_COMPOUNDING, HALF_COMPOUNDING
+from acorn.constants import NOTIONAL_TRADING_CAPITAL, FX_PAIRS
 from acorn.datavalidation import DataValidator
 from acorn.enums import CapitalCorrection
 from acorn.forecast import Forecaster
+from acorn.fx import FxTable
+from acorn.portfolio import PortfolioSnapshot, security_properties
+from acorn.rebalance import DeviationBound
 from acorn.risk import InstrumentRiskEstimator
 from acorn.risktarget import RISK_TARGET, IDMData
 from acorn.rules import BreakoutRule, EWMACRule, AccelRule
+from acorn.stoploss import TrailingStopWatch, STOP_LOSS_FRACTION
 from acorn.utils import round_to_lot_size, load_margin_rates
 
 # https://qoppac.blogspot.com/2020/03/how-much-risk-should-we-take.html
 
-NOTIONAL_TRADING_CAPITAL = 25_000
 EXPOSURE_DEVIATION_THRESHOLD = 0.2
 VOLA_WINDOW = 35
 TRACE = True
+USE_TRAILING_STOP = True
+# run the full sizing path for positions which the deviation bound would skip, and report any missed trades
+VALIDATE_SKIPS = False
 
 # trading capital should be fixed (or half-compounded) in backtest and variable in live
 # https://qoppac.blogspot.com/2016/06/capital-correction-pysystemtrade.html
 CAPITAL_CORRECTION = CapitalCorrection.FIXED
 # CAPITAL_CORRECTION = CapitalCorrection.FULL_COMPOUNDING
+# CAPITAL_CORRECTION = CapitalCorrection.HALF_COMPOUNDING
+CAPITAL_SCHEMES = {
+    CapitalCorrection.FIXED: FIXED,
+    CapitalCorrection.FULL_COMPOUNDING: FULL_COMPOUNDING,
+    CapitalCorrection.HALF_COMPOUNDING: HALF_COMPOUNDING,
+}
 
 
 EXCLUDE_INSTRUMENTS = {
@@ -92,66 +106,118 @@ class PositionDirection(Enum):
     SHORT = 2
 
 
+def direction(value: float) -> PositionDirection:
+    if value > 0:
+        return PositionDirection.LONG
+    elif value < 0:
+        return PositionDirection.SHORT
+    else:
+        return PositionDirection.NONE
+
+
 class Position:
 
-    def __init__(self, api: QCAlgorithm, cfd: Cfd, capital, idm_data: IDMData,
+    def __init__(self, api: QCAlgorithm, cfd: Cfd, capital_engine: CapitalEngine, idm_data: IDMData,
                  forecaster: Forecaster,
-                 risk_estimator: InstrumentRiskEstimator):
+                 risk_estimator: InstrumentRiskEstimator,
+                 fx: FxTable,
+                 stops: TrailingStopWatch):
         self.api = api
         self.cfd = cfd
-        self._capital = capital
+        self.symbol = cfd.Symbol
+        self.ticker = cfd.Symbol.Value
+        self.properties = security_properties(cfd)
+        self.fx = fx
+        self.stops = stops
+        self.quote_currency = cfd.QuoteCurrency.Symbol
+        self.capital_engine = capital_engine
         self.idm_data = idm_data
         self.forecaster = forecaster
         self.risk_estimator = risk_estimator
 
         self.trend = None
         self.last_position = PositionDirection.NONE
-        self.high_watermark = 0
+        self.stopped_direction = PositionDirection.NONE
         self.stop_loss_gap = None
+        self.bound = DeviationBound(EXPOSURE_DEVIATION_THRESHOLD)
 
-    def on_data(self, data: Slice):
+    def on_data(self, data: Slice, snapshot: PortfolioSnapshot):
 
-        if not self.forecaster.ready():
+        if not self.forecaster.ready() or not self.fx.ready(self.quote_currency):
             return
 
-        forecast, raw_forecast_data = self.forecaster.forecast(data)
-        # forecast = self.forecaster.forecast(data)
+        forecast = self.forecaster.forecast(data)
+        if self.stopped_direction != PositionDirection.NONE:
+            if direction(forecast) == self.stopped_direction:
+                # after a stop loss, stay out of the market until the forecast reverses
+                forecast = 0.0
+            else:
+                self.stopped_direction = PositionDirection.NONE
+
+        price = snapshot.price[self.ticker]
+        quantity = snapshot.quantity[self.ticker]
+        lot_size, multiplier, leverage = self.properties
+        risk = self.risk_estimator.estimate()
+        capital = self.capital
+        if capital <= 0:
+            # the losses have used up all the capital, so the target position is zero
+            if quantity != 0:
+                self.api.Debug(f"{data.UtcTime} {self.symbol} no capital left, closing position of {quantity}")
+                self.api.Liquidate(self.symbol)
+            return
+        margin_remaining = snapshot.margin_remaining / len(self.api.positions)
+
+        fx = self.fx_instrument_to_account()
+        raw_target_risk = self.raw_target_risk(risk)
+        target_risk = raw_target_risk * self.idm_data.idm
 
-        buying_power = self.api.Portfolio.GetBuyingPower(self.cfd.Symbol, OrderDirection.Buy)
-        portfolio_value = self.api.Portfolio.TotalPortfolioValue
-        margin_remaining = self.api.Portfolio.MarginRemaining / len(self.api.Portfolio)
+        # Stop loss gap = instrument risk in price units × stop loss fraction
+        self.stop_loss_gap = STOP_LOSS_FRACTION * risk * price
+        self.stops.set_gap(self.symbol, self.stop_loss_gap)
 
-        ideal_notional_exposure = self.notional_exposure(forecast)
+        ideal_notional_exposure = self.notional_exposure(forecast, risk)
         # TODO: better to halve the trading capital if only trading one instrument.
-        if margin_remaining * self.cfd.Leverage < abs(ideal_notional_exposure):
-            capped_notional_exposure = copysign(margin_remaining * self.cfd.Leverage, ideal_notional_exposure)
+        capped = margin_remaining * leverage < abs(ideal_notional_exposure)
+
+        # skip the full sizing path while the position can't have drifted far enough to need a trade
+        scale = price * fx * risk / (target_risk * capital)
+        skipped = not capped and self.bound.within(forecast, scale, quantity)
+        if skipped:
+            self.bound.skipped += 1
+            if not VALIDATE_SKIPS:
+                return
+        else:
+            self.bound.evaluated += 1
+
+        if capped:
+            capped_notional_exposure = copysign(margin_remaining * leverage, ideal_notional_exposure)
         else:
             capped_notional_exposure = ideal_notional_exposure
 
         # CFD (per contract) exposure = (CFD contracts × price × contract size) ÷ FX Rate
-        position = self.api.Portfolio[self.cfd.Symbol]
-        assert data[self.cfd.Symbol].Price == self.cfd.Price
-        fx = self.fx_instrument_to_account()
-        current_exposure = (position.Quantity * self.cfd.Price * self.cfd.ContractMultiplier) * fx
+        current_exposure = (quantity * price * multiplier) * fx
 
         # average exposure is the size of position for a forecast of 10
         # Average exposure = [target risk % × capital] ÷ instrument risk %
-        target_risk = self.target_risk()
-        raw_target_risk = self.raw_target_risk()
-        average_exposure = (target_risk * self.capital) / self.risk_estimator.estimate()
+        average_exposure = (target_risk * capital) / risk
         exposure_deviation = (capped_notional_exposure - current_exposure) / average_exposure
 
-        raw_position_size = self.position_size(capped_notional_exposure)
-        position_size = round_to_lot_size(raw_position_size, self.cfd.SymbolProperties.LotSize)
+        if capped:
+            self.bound.invalidate()
+        elif not skipped:
+            self.bound.record(forecast, scale, quantity, multiplier, exposure_deviation)
+
+        raw_position_size = self.position_size(capped_notional_exposure, price)
+        position_size = round_to_lot_size(raw_position_size, lot_size)
 
         if TRACE:
-            self.api.Debug(f"§ {self.api.UtcTime} {self.cfd.Symbol} "
-                           f"position: {position.Quantity} "
-                           f"price: {self.cfd.Price} "
-                           f"capital: {self.capital:.2f} "
+            self.api.Debug(f"§ {self.api.UtcTime} {self.symbol} "
+                           f"position: {quantity} "
+                           f"price: {price} "
+                           f"capital: {capital:.2f} "
                            f"raw_target_risk: {raw_target_risk:.2f} "
                            f"target_risk: {target_risk:.2f} "
-                           f"returns_vol: {self.risk_estimator.estimate():.2f} "
+                           f"returns_vol: {risk:.2f} "
                            f"forecast: {forecast:.1f} "
                            f"ideal_exposure: {ideal_notional_exposure:.1f} "
                            f"capped_exposure: {capped_notional_exposure:.1f} "
@@ -159,51 +225,70 @@ class Position:
                            f"average_exposure: {average_exposure:.1f} "
                            f"exposure_deviation: {exposure_deviation:.2f} "
                            f"fx: {fx:.2f} "
-                           f"lot_size: {self.cfd.SymbolProperties.LotSize} "
-                           f"leverage: {self.cfd.Leverage} "
+                           f"lot_size: {lot_size} "
+                           f"leverage: {leverage} "
                            f"raw_pos_size: {raw_position_size:.2f} "
                            f"pos_size: {position_size:.1f} "
-                           f"portfolio_value: {portfolio_value:.2f} "
-                           f"buying_power: {buying_power:.2f} "
-                           f"margin_used: {self.api.Portfolio.TotalMarginUsed:.2f} "
-                           f"margin_remaining: {self.api.Portfolio.MarginRemaining:.2f}"
+                           f"stop_loss_gap: {self.stop_loss_gap:.2f} "
+                           f"portfolio_value: {snapshot.total_portfolio_value:.2f} "
+                           f"buying_power: {snapshot.buying_power(self.ticker):.2f} "
+                           f"margin_used: {snapshot.total_margin_used:.2f} "
+                           f"margin_remaining: {snapshot.margin_remaining:.2f}"
                            )
             self.api.Debug(
-                f"∞ {self.api.UtcTime} {self.cfd.Symbol} "
-                f"{[f.name + ': ' + f'{round(f.forecast, 2)}' for f in raw_forecast_data]}")
+                f"∞ {self.api.UtcTime} {self.symbol} "
+                f"{self.forecaster.trace()}")
 
         if abs(exposure_deviation) > EXPOSURE_DEVIATION_THRESHOLD:
-            order_quantity = round_to_lot_size(position_size - position.Quantity, self.cfd.SymbolProperties.LotSize)
+            order_quantity = round_to_lot_size(position_size - quantity, lot_size)
             if order_quantity != 0:
-                self.api.Debug(f"{data.UtcTime} {self.cfd.Symbol} sending order {order_quantity}")
-                self.api.MarketOrder(self.cfd.Symbol, order_quantity)
+                if skipped:
+                    self.bound.missed += 1
+                    self.api.Error(f"{data.UtcTime} {self.symbol} trade of {order_quantity} missed by skipping "
+                                   f"exposure_deviation: {exposure_deviation:.2f}")
+                self.api.Debug(f"{data.UtcTime} {self.symbol} sending order {order_quantity}")
+                self.api.MarketOrder(self.symbol, order_quantity)
+
+    def on_fill(self, fill_price: float):
+        self.bound.invalidate()
+        quantity = self.api.Portfolio[self.symbol].Quantity
+        if quantity == 0 or not USE_TRAILING_STOP:
+            self.stops.unwatch(self.symbol)
+        else:
+            self.stops.watch(self.symbol, 1 if quantity > 0 else -1, fill_price, self.stop_loss_gap)
+
+    def stop_out(self):
+        quantity = self.api.Portfolio[self.symbol].Quantity
+        self.api.Debug(f"{self.api.UtcTime} {self.symbol} trailing stop hit at {self.cfd.Price} "
+                       f"watermark: {self.stops.watermark(self.symbol)} "
+                       f"trigger: {self.stops.trigger_level(self.symbol)}")
+        self.stopped_direction = direction(quantity)
+        self.stops.unwatch(self.symbol)
+        self.api.Liquidate(self.symbol)
 
     @property
     def capital(self):
-        if CAPITAL_CORRECTION == CapitalCorrection.FULL_COMPOUNDING:
-            return self.api.Portfolio.TotalPortfolioValue / len(INSTRUMENTS)
-        else:
-            return self._capital
+        return self.capital_engine.instrument_capital
 
-    def notional_exposure(self, forecast: float) -> float:
+    def notional_exposure(self, forecast: float, risk: float) -> float:
         # Formula 14: Notional exposure from risk and capital
         # Notional exposure = (target risk % × capital) ÷ instrument risk %
         # the instrument risk is the annualised standard deviation of returns.
 
-        notional_exposure = ((forecast / 10) * self.target_risk() * self.capital) / self.risk_estimator.estimate()
+        notional_exposure = ((forecast / 10) * self.target_risk(risk) * self.capital) / risk
         return notional_exposure
 
-    def target_risk(self) -> float:
-        return self.raw_target_risk() * self.idm_data.idm
+    def target_risk(self, risk: float) -> float:
+        return self.raw_target_risk(risk) * self.idm_data.idm
 
-    def raw_target_risk(self) -> float:
+    def raw_target_risk(self, risk: float) -> float:
         # The target risk is the annual standard deviation that you want on your account.
 
         # Target risk should be the set at the lowest, most conservative, value from the following list:
         # * maximum risk possible given leverage allowed by brokers or exchanges
         # Formula 15: Risk target possible given maximum leverage
         # Risk target = (Maximum leverage factor × instrument risk)
-        risk_given_max_leverage = self.cfd.Leverage * self.risk_estimator.estimate()
+        risk_given_max_leverage = self.properties.leverage * risk
         #
         # * maximum risk possible given prudent leverage limits
         # todo: add prudent leverage risk limits
@@ -224,20 +309,12 @@ class Position:
         return min(risk_given_max_leverage, personal_appetite, half_kelly)
 
     def fx_account_to_instrument(self) -> float:
-        if self.cfd.QuoteCurrency.Symbol == self.api.AccountCurrency:
-            return 1
-        else:
-            # todo: euro instruments not working
-            return 1 / self.cfd.QuoteCurrency.CurrencyConversion.ConversionRate
+        return self.fx.rate(self.fx.account_currency, self.quote_currency)
 
     def fx_instrument_to_account(self) -> float:
-        if self.cfd.QuoteCurrency.Symbol == self.api.AccountCurrency:
-            return 1
-        else:
-            # todo: euro instruments not working
-            return self.cfd.QuoteCurrency.CurrencyConversion.ConversionRate
+        return self.fx.rate(self.quote_currency, self.fx.account_currency)
 
-    def position_size(self, notional_exposure: float):
+    def position_size(self, notional_exposure: float, price: float):
         # Calculating position sizes for a given trade is a two-step process.
         # Step one: determine the required notional exposure in your home currency for your chosen instrument.
         # For example, we may want to take £7,500 of long exposure to the Euro Stoxx 50 equity index.
@@ -248,7 +325,7 @@ class Position:
 
         # contracts = (Exposure home currency × FX Rate) ÷ (price × contract size)
         fx = self.fx_account_to_instrument()
-        contracts = (notional_exposure * fx) / (self.cfd.Price * self.cfd.ContractMultiplier)
+        contracts = (notional_exposure * fx) / (price * self.properties.multiplier)
 
         return contracts
 
@@ -266,17 +343,32 @@ class StarterSystem(QCAlgorithm):
         # self.SetEndDate(2004, 6, 1)
         # self.SetEndDate(2003, 6, 25)
         self.SetEndDate(2022, 7, 1)
-        self.SetCash(NOTIONAL_TRADING_CAPITAL)  # Set Strategy Cash
+        # a sharded backtest trades its share of the notional capital, see acorn.sharding
+        trading_capital = float(self.GetParameter("capital") or NOTIONAL_TRADING_CAPITAL)
+        self.SetCash(trading_capital)  # Set Strategy Cash
         self.data_validator = DataValidator(api=self)
         self.positions = []
+        self.positions_by_symbol = {}
+        self.stops = TrailingStopWatch()
 
         leverage = load_margin_rates()
 
+        self.fx = FxTable(self.AccountCurrency)
+        for ticker in FX_PAIRS:
+            forex = self.AddForex(ticker, Resolution.Daily, market=Market.Oanda)
+            self.fx.add_pair(ticker, forex.Symbol)
+        self.fx.compile()
+
         config_instrument = self.GetParameter("instrument")
         if config_instrument == '$INSTRUMENT':
             instruments = sorted(INSTRUMENTS)
         else:
-            instruments = [config_instrument]
+            instruments = config_instrument.split(',')
+
+        # in a sharded backtest the IDM is that of the full universe, not of the instruments in the shard
+        universe_size = self.GetParameter("universe-size")
+
+        self.capital_engine = CapitalEngine(trading_capital, len(instruments), CAPITAL_SCHEMES[CAPITAL_CORRECTION])
 
         for ticker in instruments:
             cfd = self.AddCfd(ticker, Resolution.Hour,
@@ -285,13 +377,6 @@ class StarterSystem(QCAlgorithm):
                               fillDataForward=False)
             self.Debug(f"Added cfd {cfd.Symbol}")
 
-            # TODO: Failed to assign conversion rates for the following cash: EUR,HKD.
-            #  Attempting to request daily resolution history to resolve conversion rate
-            if cfd.QuoteCurrency.Symbol in ['HKD', 'EUR']:
-                self.RemoveSecurity(cfd.Symbol)
-                self.Debug(f"Excluding cfd {cfd.Symbol} with currency {cfd.QuoteCurrency.Symbol}")
-                continue
-
             risk_estimator = InstrumentRiskEstimator(self, cfd, VOLA_WINDOW)
 
             rules = [
@@ -312,14 +397,13 @@ class StarterSystem(QCAlgorithm):
 
             forecaster = Forecaster(rules)
 
-            capital = round(NOTIONAL_TRADING_CAPITAL / len(instruments), 0)
-
-            idm_data = RISK_TARGET[len(self.Portfolio)]
+            idm_data = RISK_TARGET[int(universe_size) if universe_size else len(self.positions) + 1]
 
-            position = Position(self, cfd, capital,
+            position = Position(self, cfd, self.capital_engine,
                                 idm_data,
-                                forecaster, risk_estimator)
+                                forecaster, risk_estimator, self.fx, self.stops)
             self.positions.append(position)
+            self.positions_by_symbol[cfd.Symbol] = position
 
         self.last_processed_date = defaultdict(lambda: date(1970, 1, 1))
         self.data = []
@@ -328,23 +412,43 @@ class StarterSystem(QCAlgorithm):
         for k, v in self.Portfolio.items():
             self.Debug(f"{k} {v}")
 
+        self.Debug(f"rebalance evaluated: {sum(p.bound.evaluated for p in self.positions)} "
+                   f"skipped: {sum(p.bound.skipped for p in self.positions)} "
+                   f"missed: {sum(p.bound.missed for p in self.positions)}")
+
         # df = pd.DataFrame(self.data, columns=['datetime', 'price', 'daily_return', 'returns_vol', 'position'])
         # df = df.set_index('datetime')
         # # df = df.resample('1B').first()
         # df.to_pickle(f'/Results/data.pkl')
 
+    def OnOrderEvent(self, orderEvent: OrderEvent) -> None:
+        if orderEvent.Status in (OrderStatus.Filled, OrderStatus.PartiallyFilled):
+            position = self.positions_by_symbol.get(orderEvent.Symbol)
+            if position is not None:
+                position.on_fill(orderEvent.FillPrice)
+
     def OnData(self, data: Slice):
         # self.Debug(f"{data.UtcTime} price: {data['CORNUSD'].Price}")
         # return
 
         self.data_validator.validate(data)
+        self.fx.update(data)
+
+        # trailing stops are checked on every hourly bar, for the open positions only
+        for symbol in self.stops.check(data):
+            self.positions_by_symbol[symbol].stop_out()
+
+        today = data.UtcTime.date()
+        rebalance = [position for position in self.positions
+                     if position.cfd.Exchange.ExchangeOpen and
+                     today > self.last_processed_date[position.cfd] and
+                     data.ContainsKey(position.symbol)]
+        if not rebalance:
+            return
 
-        for position in self.positions:
-            if position.cfd.Exchange.ExchangeOpen:
-                if (data.UtcTime.date() > self.last_processed_date[position.cfd] and
-                        data.ContainsKey(position.cfd.Symbol)):
-                    position.on_data(data)
-                    self.last_processed_date[position.cfd] = data.UtcTime.date()
-
-                    # self.Debug(f"price: {data['CORNUSD'].Price}")
-                    # return
+        # the portfolio is read once for all the positions rebalanced by this slice
+        snapshot = PortfolioSnapshot(self.Portfolio, [(p.ticker, p.cfd) for p in rebalance])
+        self.capital_engine.update(today, snapshot.total_portfolio_value)
+        for position in rebalance:
+            position.on_data(data, snapshot)
+            self.last_processed_date[position.cfd] = today
@@ -0,0 +1,35 @@
+# Run one backtest per instrument (or group of instruments) in parallel and merge the results:
+#
+# > python starter_system/run_sharded.py --group-size 2 XAGUSD XAUUSD BCOUSD CORNUSD
+#
+# Only the shards whose parameters, data or source changed since their last run are re-run.
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from acorn.constants import NOTIONAL_TRADING_CAPITAL
+from acorn.sharding import ShardedBacktest, plan_shards
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sharded starter system backtest')
+    parser.add_argument('instruments', nargs='+')
+    parser.add_argument('--capital', type=float, default=NOTIONAL_TRADING_CAPITAL)
+    parser.add_argument('--group-size', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--data-folder', default='data')
+    parser.add_argument('--output', default='starter_system/shards')
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    project = Path('starter_system')
+    shards = plan_shards(args.instruments, args.capital, args.group_size)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        backtest = ShardedBacktest(project, shards, args.output, args.data_folder, executor=executor)
+        ran = backtest.run(force=args.force)
+        print(f"ran {len(ran)} of {len(shards)} shards: {', '.join(ran)}")
+
+    merged = backtest.merge()
+    for name, value in merged['Statistics'].items():
+        print(f"{name}: {value}")